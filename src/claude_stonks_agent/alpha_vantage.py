@@ -1,8 +1,14 @@
 import requests
 import os
+import threading
+import time
+from cachetools import LRUCache, TTLCache
 from dataclasses import dataclass
 from functools import lru_cache
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
+from claude_stonks_agent.history_store import DailyHistory, DailyHistoryStore
+from claude_stonks_agent.market_calendar import MarketCalendar
 
 
 @dataclass
@@ -25,6 +31,13 @@ class TimeSeriesDaily:
     volume: int
 
 
+@dataclass
+class Quote:
+    symbol: str
+    price: float
+    latest_trading_day: str
+
+
 @dataclass
 class Overview:
     symbol: str
@@ -37,13 +50,43 @@ def _parse_date(date_text: str) -> datetime:
     return datetime.strptime(date_text, "%Y-%m-%d")
 
 
+def parse_symbols(text: str) -> list[str]:
+    """A comma separated list of symbols, e.g. AAPL,MSFT,GOOG"""
+    return [ symbol.strip().upper() for symbol in text.split(',') if symbol.strip() ]
+
+
+def _time_series_daily_from_row(row: tuple) -> TimeSeriesDaily:
+    date, open, high, low, close, volume = row
+    return TimeSeriesDaily(
+        date=date,
+        date_value=_parse_date(date),
+        open=open,
+        high=high,
+        low=low,
+        close=close,
+        volume=volume
+    )
+
+
 class AlphaVantageClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = 'https://www.alphavantage.co/query'):
         if not api_key:
             raise ValueError('API key is required')
 
         self.api_key = api_key
-        self.base_url = 'https://www.alphavantage.co/query'
+        self.base_url = base_url
+
+    def _get(self, params: dict) -> dict:
+        response = requests.get(self.base_url, params=params)
+        response.raise_for_status()
+        response_data = response.json()
+
+        # rate limits and other problems come back as a 200 with just a message
+        for message_key in ('Note', 'Information', 'Error Message'):
+            if message_key in response_data:
+                raise Exception(f'Alpha Vantage: {response_data[message_key]}')
+
+        return response_data
 
     def search(self, term: str) -> list[SearchResult]:
         params = {
@@ -52,9 +95,7 @@ class AlphaVantageClient:
             'datatype': 'json',
             'apikey': self.api_key
         }
-        response = requests.get(self.base_url, params=params)
-        response.raise_for_status()
-        response_data = response.json()
+        response_data = self._get(params)
 
         def build_search_result(data: dict) -> SearchResult:
             return SearchResult(
@@ -78,9 +119,7 @@ class AlphaVantageClient:
             'datatype': 'json',
             'apikey': self.api_key
         }
-        response = requests.get(self.base_url, params=params)
-        response.raise_for_status()
-        response_data = response.json()
+        response_data = self._get(params)
 
         def build_time_series_daily(date: str, data: dict) -> TimeSeriesDaily:
             return TimeSeriesDaily(
@@ -97,6 +136,27 @@ class AlphaVantageClient:
 
         return list(map(lambda item: build_time_series_daily(item[0], item[1]), data.items()))
 
+    def fetch_quote(self, symbol: str) -> Quote:
+        params = {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': symbol,
+            'datatype': 'json',
+            'apikey': self.api_key
+        }
+        response_data = self._get(params)
+
+        data: dict[str, str] = response_data.get('Global Quote')
+
+        # unknown symbols come back with an empty quote
+        if not data:
+            raise ValueError(f'No quote found for {symbol}')
+
+        return Quote(
+            symbol=data['01. symbol'],
+            price=float(data['05. price']),
+            latest_trading_day=data['07. latest trading day']
+        )
+
     def fetch_overiew(self, symbol: str) -> Overview:
         params = {
             'function': 'OVERVIEW',
@@ -104,9 +164,7 @@ class AlphaVantageClient:
             'datatype': 'json',
             'apikey': self.api_key
         }
-        response = requests.get(self.base_url, params=params)
-        response.raise_for_status()
-        response_data = response.json()
+        response_data = self._get(params)
 
         return Overview(
             symbol=response_data['Symbol'],
@@ -129,10 +187,25 @@ class AlphaVantageService:
         if not api_key:
             raise ValueError('ALPHA_VANTAGE_API_KEY env variable is required')
 
-        return AlphaVantageService(AlphaVantageClient(api_key))
+        return AlphaVantageService(AlphaVantageClient(api_key), DailyHistoryStore.create())
 
-    def __init__(self, client: AlphaVantageClient):
+    def __init__(self, client: AlphaVantageClient, history_store: Optional[DailyHistoryStore] = None, calendar: Optional[MarketCalendar] = None):
         self.client = client
+        self.history_store = history_store
+        self.calendar = calendar or MarketCalendar()
+        self._daily: LRUCache[str, list[TimeSeriesDaily]] = LRUCache(maxsize=128)
+        # rows built from a stored history, kept with the mapping they were built from as the store only re-opens a file once it's replaced
+        self._daily_from_store: LRUCache[str, tuple[DailyHistory, list[TimeSeriesDaily]]] = LRUCache(maxsize=128)
+        self._quotes: TTLCache[str, Quote] = TTLCache(maxsize=1024, ttl=self.quote_ttl_seconds)
+        # kept with the latest bar date when fetched, market caps move with the price so they're refetched once a new bar is out
+        self._overviews: LRUCache[str, tuple[date, Overview]] = LRUCache(maxsize=1024)
+        self._refreshing: set[str] = set()
+        self._refreshed_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # don't keep refetching a symbol whose new bar hasn't been published yet
+    min_refresh_interval_seconds: float = 15 * 60
+    quote_ttl_seconds: float = 60
 
     @lru_cache(maxsize=1024)
     def search(self, term: str) -> list[SearchResult]:
@@ -142,27 +215,175 @@ class AlphaVantageService:
 
         return list(filter(is_us_equity, self.client.search(term)))
 
-    @lru_cache(maxsize=128)
     def fetch_daily(self, symbol: str) -> list[TimeSeriesDaily]:
-        return self.client.fetch_daily(symbol)
+        """
+        Cached history, which is still served while a stale one is refreshed in the background.
+        With a history store this builds a row object per day, once per stored file, so prefer daily_history for reading whole columns.
+        """
+        if self.history_store:
+            history = self.daily_history(symbol)
+
+            with self._lock:
+                cached = self._daily_from_store.get(symbol)
+            if cached and cached[0] is history:
+                return cached[1]
+
+            daily = [ _time_series_daily_from_row(history.row(index)) for index in reversed(range(len(history))) ]
+
+            with self._lock:
+                self._daily_from_store[symbol] = (history, daily)
+
+            return daily
+
+        with self._lock:
+            daily = self._daily.get(symbol)
+
+        if daily is None:
+            return self.refresh_daily(symbol)
+
+        if self._is_stale(daily[0].date_value.date() if daily else None):
+            self._refresh_in_background(symbol)
+
+        return daily
+
+    def daily_history(self, symbol: str) -> DailyHistory:
+        """Memory mapped history from the store, fetching and storing it first if missing and refreshing in the background if stale."""
+        history = self.history_store.open(symbol)
+
+        if history is None:
+            self.refresh_daily(symbol)
+            return self.history_store.open(symbol)
+
+        if self._is_stale(history.latest_date()):
+            self._refresh_in_background(symbol)
+
+        return history
+
+    def _is_stale(self, latest_date: Optional[date]) -> bool:
+        return latest_date is None or self.calendar.is_stale(latest_date)
+
+    def _cached_latest_bar(self, symbol: str) -> Optional[tuple[date, float]]:
+        """Date and close of the newest bar already cached, without fetching anything."""
+        if self.history_store:
+            history = self.history_store.open(symbol)
+            return (history.latest_date(), history.latest_close()) if history and len(history) else None
+
+        with self._lock:
+            daily = self._daily.get(symbol)
+        return (daily[0].date_value.date(), daily[0].close) if daily else None
+
+    def _cached_latest_date(self, symbol: str) -> Optional[date]:
+        latest_bar = self._cached_latest_bar(symbol)
+        return latest_bar[0] if latest_bar else None
+
+    def is_daily_stale(self, symbol: str) -> bool:
+        """Whether the cached history is missing or older than the latest bar the market calendar expects."""
+        return self._is_stale(self._cached_latest_date(symbol))
+
+    def refresh_daily(self, symbol: str) -> list[TimeSeriesDaily]:
+        """Fetches the full history for a symbol, replacing whatever is cached."""
+        daily = self.client.fetch_daily(symbol)
+
+        with self._lock:
+            self._refreshed_at[symbol] = time.monotonic()
+            if not self.history_store:
+                self._daily[symbol] = daily
+
+        if self.history_store:
+            self.history_store.write(symbol, daily)
+
+        return daily
+
+    def _claim_refresh(self, symbol: str) -> bool:
+        """False if the symbol is already being refreshed or was too recently for a new bar to be out, otherwise marks it as refreshing."""
+        with self._lock:
+            recently_refreshed = time.monotonic() - self._refreshed_at.get(symbol, -self.min_refresh_interval_seconds) < self.min_refresh_interval_seconds
+            if symbol in self._refreshing or recently_refreshed:
+                return False
+            self._refreshing.add(symbol)
+            return True
+
+    def _release_refresh(self, symbol: str):
+        with self._lock:
+            self._refreshing.discard(symbol)
+
+    def try_refresh_daily(self, symbol: str) -> bool:
+        """Refreshes now unless another refresh of the symbol is running or one finished too recently, returning whether it did."""
+        if not self._claim_refresh(symbol):
+            return False
+
+        try:
+            self.refresh_daily(symbol)
+        finally:
+            self._release_refresh(symbol)
+
+        return True
+
+    def _refresh_in_background(self, symbol: str):
+        if not self._claim_refresh(symbol):
+            return
+
+        def refresh():
+            try:
+                self.refresh_daily(symbol)
+            except Exception as ex:
+                print(f'ERROR: Failed to refresh {symbol}')
+                print(ex)
+            finally:
+                self._release_refresh(symbol)
+
+        threading.Thread(target=refresh, daemon=True).start()
 
-    @lru_cache(maxsize=1024)
     def overview(self, symbol: str) -> Overview:
-        return self.client.fetch_overiew(symbol)
+        latest_bar_date = self.calendar.latest_bar_date()
 
+        with self._lock:
+            cached = self._overviews.get(symbol)
+        if cached and cached[0] == latest_bar_date:
+            return cached[1]
 
-    def latest_price(self, symbol: str) -> float:
-        daily = self.fetch_daily(symbol)
+        overview = self.client.fetch_overiew(symbol)
+
+        with self._lock:
+            self._overviews[symbol] = (latest_bar_date, overview)
 
-        if len(daily) == 0:
-            raise ValueError(f'No data found for {symbol}')
+        return overview
 
-        return daily[0].close
+
+    def latest_price(self, symbol: str) -> float:
+        """
+        From a single small quote request, cached briefly. Falls back to the close of an already cached daily history if the quote fails.
+        """
+        with self._lock:
+            quote = self._quotes.get(symbol)
+        if quote:
+            return quote.price
+
+        try:
+            quote = self.client.fetch_quote(symbol)
+        except Exception:
+            latest_bar = self._cached_latest_bar(symbol)
+            if latest_bar:
+                return latest_bar[1]
+            raise
+
+        with self._lock:
+            self._quotes[symbol] = quote
+
+        return quote.price
 
     def _find_daily_for_date(self, symbol: str, date: str) -> TimeSeriesDaily:
-        daily = self.fetch_daily(symbol)
         date_value = _parse_date(date)
 
+        if self.history_store:
+            history = self.daily_history(symbol)
+            index = history.index_on_or_before(date_value)
+            if index is None:
+                raise ValueError(f'No data found for {symbol} on {date}')
+            return _time_series_daily_from_row(history.row(index))
+
+        daily = self.fetch_daily(symbol)
+
         for item in daily:
             # assume sorted in reverse chonological order
             if item.date_value <= date_value:
@@ -171,6 +392,10 @@ class AlphaVantageService:
         raise ValueError(f'No data found for {symbol} on {date}')
 
 
+    def daily_on_date(self, symbol: str, date: str) -> TimeSeriesDaily:
+        """The bar for the date, or the last trading day before it."""
+        return self._find_daily_for_date(symbol, date)
+
     def price_on_date(self, symbol: str, date: str) -> float:
         return self._find_daily_for_date(symbol, date).close
 
@@ -0,0 +1,294 @@
+"""
+Record a real conversation's Bedrock completions and Alpha Vantage responses to a cassette file, then replay it offline to compare builds.
+
+    python -m claude_stonks_agent.cassette record conversation.json "What is the price of Tesla?" "And Apple?"
+    python -m claude_stonks_agent.cassette replay conversation.json --zero-latency
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, List, Optional
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseLLM
+from langchain_core.language_models.llms import LLM
+from langgraph.graph import END
+from claude_stonks_agent.alpha_vantage import AlphaVantageClient, AlphaVantageService
+from claude_stonks_agent.claude import create_llm
+from claude_stonks_agent.graph import create_graph
+from claude_stonks_agent.market_calendar import MarketCalendar
+from claude_stonks_agent.router import fast_path_stats
+
+
+_cassette_version = 2
+
+# only llm prompts carry anything that changes between runs (the current date), alpha vantage requests must match exactly
+_order_fallback_kinds = { 'llm' }
+
+
+def _key(kind: str, request: Any) -> str:
+    return kind + ':' + hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+class Cassette:
+    """
+    Ordered log of responses and how long each took. Replay matches on the request. LLM prompts that differ between runs
+    (e.g. containing the current date) fall back to the next unused completion in recorded order unless strict.
+    recorded_at is when the recording was made, replays run against a market calendar pinned to it.
+    """
+    def __init__(
+            self,
+            inputs: Optional[list[str]] = None,
+            entries: Optional[list[dict]] = None,
+            recorded_at: Optional[datetime] = None,
+            zero_latency: bool = False,
+            strict: bool = False
+        ):
+        self.inputs = inputs or []
+        self.entries = entries or []
+        self.recorded_at = recorded_at or datetime.now(MarketCalendar.timezone)
+        self.zero_latency = zero_latency
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._used = [ False ] * len(self.entries)
+        self._by_key: dict[str, deque[int]] = defaultdict(deque)
+        self._last_by_key: dict[str, int] = {}
+        self._by_kind: dict[str, deque[int]] = defaultdict(deque)
+
+        for index, entry in enumerate(self.entries):
+            self._by_key[entry['key']].append(index)
+            self._by_kind[entry['kind']].append(index)
+
+    @staticmethod
+    def load(path: str, zero_latency: bool = False, strict: bool = False) -> 'Cassette':
+        with open(path) as file:
+            data = json.load(file)
+
+        if data.get('version') != _cassette_version:
+            raise ValueError(f'Unsupported cassette version: {data.get("version")}')
+
+        return Cassette(
+            data['inputs'],
+            data['entries'],
+            recorded_at=datetime.fromisoformat(data['recorded_at']),
+            zero_latency=zero_latency,
+            strict=strict
+        )
+
+    def save(self, path: str):
+        with open(path, 'w') as file:
+            json.dump({
+                'version': _cassette_version,
+                'recorded_at': self.recorded_at.isoformat(),
+                'inputs': self.inputs,
+                'entries': self.entries
+            }, file, indent=1)
+
+    def record(self, kind: str, request: Any, response: Any, seconds: float):
+        with self._lock:
+            self.entries.append({ 'kind': kind, 'key': _key(kind, request), 'response': response, 'seconds': seconds })
+
+    def _take(self, index: int) -> dict:
+        self._used[index] = True
+        return self.entries[index]
+
+    def play(self, kind: str, request: Any) -> Any:
+        key = _key(kind, request)
+
+        with self._lock:
+            matches = self._by_key[key]
+            while matches and self._used[matches[0]]:
+                matches.popleft()
+
+            if matches:
+                self._last_by_key[key] = matches[0]
+                entry = self._take(matches.popleft())
+            elif kind not in _order_fallback_kinds and key in self._last_by_key:
+                # the same request made more often than when recorded, e.g. after a cache expired sooner, gets the same response again
+                entry = self.entries[self._last_by_key[key]]
+            elif self.strict or kind not in _order_fallback_kinds:
+                raise KeyError(f'No recorded {kind} response for request: {request}')
+            else:
+                in_order = self._by_kind[kind]
+                while in_order and self._used[in_order[0]]:
+                    in_order.popleft()
+                if not in_order:
+                    raise KeyError(f'Cassette has run out of {kind} responses')
+                entry = self._take(in_order.popleft())
+
+        if not self.zero_latency:
+            time.sleep(entry['seconds'])
+
+        return entry['response']
+
+
+def _http_request(params: dict) -> dict:
+    # the api key isn't part of the recording
+    return { key: value for key, value in params.items() if key != 'apikey' }
+
+
+class CassetteAlphaVantageClient(AlphaVantageClient):
+    """
+    Records real responses when given a cassette to record into, otherwise serves them from the cassette without any network access
+    """
+    def __init__(self, cassette: Cassette, api_key: str = 'replay', recording: bool = False, base_url: str = 'https://www.alphavantage.co/query'):
+        super().__init__(api_key, base_url=base_url)
+        self.cassette = cassette
+        self.recording = recording
+
+    def _get(self, params: dict) -> dict:
+        request = _http_request(params)
+
+        if not self.recording:
+            return self.cassette.play('alpha_vantage', request)
+
+        start = time.perf_counter()
+        response = super()._get(params)
+        self.cassette.record('alpha_vantage', request, response, time.perf_counter() - start)
+
+        return response
+
+
+class CassetteLLM(LLM):
+    """
+    Wraps the real LLM to record completions when recording, otherwise plays completions back from the cassette
+    """
+    cassette: Cassette
+    llm: Optional[BaseLLM] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return 'cassette'
+
+    def _call(
+            self,
+            prompt: str,
+            stop: List[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None,
+            **kwargs: Any
+        ) -> str:
+        request = { 'prompt': prompt, 'stop': stop }
+
+        if self.llm is None:
+            return self.cassette.play('llm', request)
+
+        start = time.perf_counter()
+        response = self.llm.invoke(prompt, stop=stop)
+        self.cassette.record('llm', request, response, time.perf_counter() - start)
+
+        return response
+
+
+@dataclass
+class ReplayProfile:
+    turns: int
+    steps: int
+    wall_seconds: float
+    cpu_seconds: float
+    peak_allocated_bytes: int
+    # still allocated at the end of the run compared to the start
+    retained_bytes: int
+    retained_blocks: int
+    # inputs seen by the fast path router, zero when it isn't enabled
+    fast_path_inputs: int
+    fast_path_answered: int
+    fast_path_hit_rate: float
+
+
+def run_conversation(graph, inputs: list[str]) -> list:
+    steps = []
+
+    for input in inputs:
+        last_response = None
+        for state in graph.stream({ 'input': input, 'steps': steps }, config={ 'recursion_limit': 100 }):
+            last_response = state
+
+        if last_response and END in last_response:
+            steps = last_response[END]['steps']
+
+    return steps
+
+
+def record(path: str, inputs: list[str]):
+    cassette = Cassette(inputs=list(inputs))
+    client = CassetteAlphaVantageClient(cassette, api_key=os.getenv('ALPHA_VANTAGE_API_KEY'), recording=True)
+    graph = create_graph(alpha_vantage=AlphaVantageService(client), llm=CassetteLLM(cassette=cassette, llm=create_llm()))
+
+    run_conversation(graph, cassette.inputs)
+    cassette.save(path)
+
+
+def replay(path: str, zero_latency: bool = False, strict: bool = False) -> ReplayProfile:
+    cassette = Cassette.load(path, zero_latency=zero_latency, strict=strict)
+
+    # as of the recording, otherwise histories that were fresh then look stale now and start background refreshes mid profile
+    calendar = MarketCalendar(fixed_now=cassette.recorded_at)
+    alpha_vantage = AlphaVantageService(CassetteAlphaVantageClient(cassette), calendar=calendar)
+    graph = create_graph(alpha_vantage=alpha_vantage, llm=CassetteLLM(cassette=cassette))
+
+    stats_before = fast_path_stats.snapshot()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        steps = run_conversation(graph, cassette.inputs)
+
+        cpu_seconds = time.process_time() - cpu_start
+        wall_seconds = time.perf_counter() - wall_start
+        _, peak = tracemalloc.get_traced_memory()
+        differences = tracemalloc.take_snapshot().compare_to(before, 'filename')
+    finally:
+        tracemalloc.stop()
+
+    router_stats = fast_path_stats.since(stats_before)
+
+    return ReplayProfile(
+        turns=len(cassette.inputs),
+        steps=len(steps),
+        wall_seconds=wall_seconds,
+        cpu_seconds=cpu_seconds,
+        peak_allocated_bytes=peak,
+        retained_bytes=sum(difference.size_diff for difference in differences),
+        retained_blocks=sum(difference.count_diff for difference in differences),
+        fast_path_inputs=router_stats.total,
+        fast_path_answered=router_stats.answered,
+        fast_path_hit_rate=router_stats.hit_rate
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay agent conversations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='run a conversation against the real services and save a cassette')
+    record_parser.add_argument('path')
+    record_parser.add_argument('inputs', nargs='+', help='the human inputs of each turn')
+
+    replay_parser = subparsers.add_parser('replay', help='replay a cassette offline and print a profile as json')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--zero-latency', action='store_true', help='serve responses immediately rather than with their recorded latency')
+    replay_parser.add_argument('--strict', action='store_true', help='fail if an llm prompt differs from the recording')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.path, args.inputs)
+    else:
+        print(json.dumps(asdict(replay(args.path, args.zero_latency, args.strict)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
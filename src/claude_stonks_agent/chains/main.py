@@ -4,6 +4,8 @@ from langchain_core.tools import StructuredTool
 from langchain_core.runnables import RunnablePassthrough, RunnableAssign, RunnableBinding
 from langchain_core.prompts import MessagesPlaceholder
 from langchain_core.runnables import RunnableLambda
+from langchain_core.language_models import BaseLLM
+from typing import Optional
 from textwrap import dedent
 
 system_message = SystemMessagePromptTemplate.from_template(
@@ -43,8 +45,8 @@ def fix_prompt_for_claude(params: dict):
     return params
 
 
-def create_chain(tools: list[StructuredTool]):
-    llm = create_llm()
+def create_chain(tools: list[StructuredTool], llm: Optional[BaseLLM] = None):
+    llm = llm or create_llm()
 
     return (
         RunnablePassthrough.assign(tools=lambda _: build_tools_description(tools))
@@ -1,5 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ConnectionError as BotocoreConnectionError, HTTPClientError
+from functools import lru_cache
 from langchain_community.llms.bedrock import Bedrock
 from langchain_community.chat_models import BedrockChat
 from typing import Any, List, Sequence, Union
@@ -11,8 +14,12 @@ from langchain_core.tools import BaseTool
 from langchain.agents.agent import AgentOutputParser
 from langchain_core.agents import AgentAction, AgentFinish
 from xml.etree import ElementTree as ET
-from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager, CallbackManagerForLLMRun
+import os
+import random
 import re
+import threading
+import time
 
 
 def fix_prompt(prompt: str) -> str:
@@ -23,13 +30,117 @@ def fix_prompt(prompt: str) -> str:
     return ai_to_assistant
 
 
+_throttling_error_codes = { 'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException' }
+_transient_error_codes = { 'ModelNotReadyException', 'ServiceUnavailableException', 'InternalServerException', 'ModelTimeoutException' }
+
+
+@lru_cache(maxsize=1)
+def create_bedrock_client():
+    """
+    Single bedrock runtime client shared by every ClaudeBedrock instance so they share a connection pool.
+    Botocore retries are disabled as ClaudeBedrock retries throttling and transient errors itself, so throttling can feed the concurrency limiter.
+    """
+    config = Config(
+        max_pool_connections=int(os.getenv('BEDROCK_MAX_POOL_CONNECTIONS', '20')),
+        retries={ 'total_max_attempts': 1, 'mode': 'standard' }
+    )
+    return boto3.client('bedrock-runtime', config=config)
+
+
+@dataclass
+class BedrockCallStats:
+    calls: int = 0
+    throttles: int = 0
+    failures: int = 0
+    queue_seconds: float = 0
+    model_seconds: float = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, queue_seconds: float = 0, model_seconds: float = 0, throttled: bool = False, failed: bool = False, completed: bool = False):
+        with self._lock:
+            self.queue_seconds += queue_seconds
+            self.model_seconds += model_seconds
+            self.throttles += throttled
+            self.failures += failed
+            self.calls += completed
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps the number of in flight calls, halving the cap when throttled and growing it by roughly one per cap's worth of successes.
+    """
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit: float = max_limit
+        self.in_flight = 0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Blocks until a slot is free and returns the seconds spent waiting."""
+        start = time.perf_counter()
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.perf_counter() - start
+
+    def release(self, started_at: float, throttled: bool = False, succeeded: bool = False):
+        """
+        started_at is the time.monotonic() the call began. Other failures leave the cap as it is.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                # calls started before the last decrease were sent under the old cap, so a burst of their throttles only halves it once
+                if started_at >= self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            elif succeeded:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+bedrock_stats = BedrockCallStats()
+bedrock_limiter = AdaptiveConcurrencyLimiter(int(os.getenv('BEDROCK_MAX_CONCURRENCY', '20')))
+
+
+def _classify_error(ex: BaseException) -> str:
+    """'throttled', 'transient' (worth retrying) or 'failed'"""
+    transient = False
+
+    # the langchain bedrock integration re-raises client errors as ValueErrors so check the whole chain
+    current: BaseException | None = ex
+    while current is not None:
+        response = getattr(current, 'response', None)
+        code = response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) if isinstance(response, dict) else 0
+        message = str(current)
+
+        if code in _throttling_error_codes or any(c in message for c in _throttling_error_codes):
+            return 'throttled'
+
+        if (
+            code in _transient_error_codes
+            or status >= 500
+            or isinstance(current, (BotocoreConnectionError, HTTPClientError))
+            or any(c in message for c in _transient_error_codes)
+        ):
+            transient = True
+
+        current = current.__cause__ or current.__context__
+
+    return 'transient' if transient else 'failed'
+
+
 class ClaudeBedrock(Bedrock):
     """
     Derived version to fix some functionality for the claude model.
     """
     def __init__(self):
         super().__init__(
-            client=boto3.client('bedrock-runtime'),
+            client=create_bedrock_client(),
             model_id='anthropic.claude-v2:1',
             model_kwargs={
                 'temperature': 0.1,
@@ -37,6 +148,53 @@ class ClaudeBedrock(Bedrock):
             }
         )
 
+    max_retries: int = int(os.getenv('BEDROCK_MAX_RETRIES', '6'))
+    backoff_base_seconds: float = 0.5
+    backoff_max_seconds: float = 20
+
+    def _call(
+            self,
+            prompt: str,
+            stop: List[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None,
+            **kwargs: Any
+        ) -> str:
+        attempt = 0
+        while True:
+            queue_seconds = bedrock_limiter.acquire()
+
+            start = time.monotonic()
+            # anything that escapes without being classified, e.g. a KeyboardInterrupt, still releases the slot as a failure
+            outcome = 'failed'
+            retry = False
+            try:
+                result = super()._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+                outcome = 'succeeded'
+            except Exception as ex:
+                outcome = _classify_error(ex)
+                retry = outcome != 'failed' and attempt < self.max_retries
+                if not retry:
+                    raise
+            finally:
+                throttled = outcome == 'throttled'
+                succeeded = outcome == 'succeeded'
+
+                bedrock_limiter.release(start, throttled=throttled, succeeded=succeeded)
+                bedrock_stats.record(
+                    queue_seconds=queue_seconds,
+                    model_seconds=time.monotonic() - start,
+                    throttled=throttled,
+                    failed=not succeeded and not retry,
+                    completed=succeeded
+                )
+
+            if not retry:
+                return result
+
+            # exponential backoff with full jitter
+            time.sleep(random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt)))
+            attempt += 1
+
     def generate_prompt(
             self, 
             prompts: List[PromptValue], 
@@ -222,14 +380,14 @@ def extract_agent_actions(text: str) -> AgentActions:
 
 
 def format_tool_responses(
-    intermediate_steps: list[tuple[AgentAction, str]],
+    intermediate_steps: list[tuple[str, Any]],
 ) -> str:
     builder = XmlBuilder()
 
     with builder.tag_with_children('function_results'):
-        for action, outcome in intermediate_steps:
+        for tool_name, outcome in intermediate_steps:
             with builder.tag_with_children('result'):
-                builder.tag_with_text('tool_name', action.tool)
+                builder.tag_with_text('tool_name', tool_name)
                 builder.tag_with_text('stdout', str(outcome), escape=False)
 
     return str(builder)
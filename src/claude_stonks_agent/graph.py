@@ -1,10 +1,13 @@
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolExecutor
-from typing import Annotated, TypedDict
+from typing import Annotated, Optional, TypedDict
+from langchain_core.language_models import BaseLLM
 from claude_stonks_agent.chains.main import create_chain as create_main_chain
 import operator
-from claude_stonks_agent.tools import create_alpha_vantage_tools
+from claude_stonks_agent.tools import create_alpha_vantage_tools, create_screener_tools
 from claude_stonks_agent.alpha_vantage import AlphaVantageService
+from claude_stonks_agent.screener import Screener
+from claude_stonks_agent.router import FastPathRouter
 from claude_stonks_agent.claude import extract_agent_actions
 from claude_stonks_agent.steps import AgentStep, HumanInputStep, ToolCallStep, ToolCallResultStep, AgentOutcomeStep
 
@@ -19,10 +22,17 @@ def has_pending_functions(state: AgentState) -> str:
     return 'run_tools' if isinstance(last_step, ToolCallStep) else END
 
 
-def create_graph():
-    alpha_vantage_tools = create_alpha_vantage_tools(AlphaVantageService.create())
+def was_answered(state: AgentState) -> str:
+    last_step = state['steps'][-1]
+    return END if isinstance(last_step, AgentOutcomeStep) else 'run_main'
+
+
+def create_graph(alpha_vantage: Optional[AlphaVantageService] = None, llm: Optional[BaseLLM] = None):
+    alpha_vantage = alpha_vantage or AlphaVantageService.create()
+    alpha_vantage_tools = create_alpha_vantage_tools(alpha_vantage) + create_screener_tools(Screener.create(alpha_vantage))
     tool_executor = ToolExecutor(alpha_vantage_tools)
-    main_chain = create_main_chain(alpha_vantage_tools)
+    main_chain = create_main_chain(alpha_vantage_tools, llm)
+    fast_path_router = FastPathRouter.create(alpha_vantage)
 
     def run_entry(state: AgentState):
         # Store the original query as the first human input step
@@ -32,6 +42,13 @@ def create_graph():
             ]
         }
 
+    def run_fast_path(state: AgentState):
+        answer = fast_path_router.answer(state['input'])
+
+        return {
+            'steps': [ AgentOutcomeStep(answer) ] if answer else []
+        }
+
     def run_main(state: AgentState):
         steps = state['steps']
         messages = AgentStep.steps_to_messages(steps)
@@ -71,7 +88,20 @@ def create_graph():
 
     workflow.set_entry_point('entry')
 
-    workflow.add_edge('entry', 'main')
+    if fast_path_router:
+        workflow.add_node('fast_path', run_fast_path)
+        workflow.add_edge('entry', 'fast_path')
+        workflow.add_conditional_edges(
+            'fast_path',
+            was_answered,
+            {
+                'run_main': 'main',
+                END: END
+            }
+        )
+    else:
+        workflow.add_edge('entry', 'main')
+
     workflow.add_edge('tools', 'main')
     workflow.add_conditional_edges(
         'main',
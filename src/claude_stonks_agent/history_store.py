@@ -0,0 +1,157 @@
+import mmap
+import os
+import re
+import struct
+import tempfile
+import numpy as np
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from claude_stonks_agent.alpha_vantage import TimeSeriesDaily
+
+
+# File layout, all little endian:
+#   header: magic (4 bytes), version (uint32), row count (uint64)
+#   then one fixed-width column after another, each row count long and in ascending date order
+_magic = b'STKD'
+_version = 1
+_header = struct.Struct('<4sIQ')
+_columns = [
+    ('date', np.dtype('<M8[D]')),
+    ('open', np.dtype('<f8')),
+    ('high', np.dtype('<f8')),
+    ('low', np.dtype('<f8')),
+    ('close', np.dtype('<f8')),
+    ('volume', np.dtype('<i8')),
+]
+
+_valid_symbol = re.compile(r'^[A-Za-z0-9.\-]+$')
+
+
+class DailyHistory:
+    """
+    Read only view over a memory mapped daily history file. Columns are numpy arrays backed directly by the mapping.
+    """
+    def __init__(self, buffer: mmap.mmap):
+        magic, version, rows = _header.unpack_from(buffer, 0)
+
+        if magic != _magic:
+            raise ValueError('Not a daily history file')
+        if version != _version:
+            raise ValueError(f'Unsupported daily history version: {version}')
+
+        self._buffer = buffer
+        self.columns: dict[str, np.ndarray] = {}
+
+        offset = _header.size
+        for name, dtype in _columns:
+            self.columns[name] = np.frombuffer(buffer, dtype=dtype, count=rows, offset=offset)
+            offset += dtype.itemsize * rows
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.columns['date']
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.columns['close']
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def latest_date(self) -> Optional[date]:
+        return self.dates[-1].astype(datetime) if len(self) else None
+
+    def latest_close(self) -> Optional[float]:
+        return float(self.close[-1]) if len(self) else None
+
+    def index_on_or_before(self, date_value: datetime) -> Optional[int]:
+        position = int(np.searchsorted(self.dates, np.datetime64(date_value, 'D'), side='right')) - 1
+        return position if position >= 0 else None
+
+    def row(self, index: int) -> tuple:
+        """(date, open, high, low, close, volume) with the date formatted as YYYY-MM-DD"""
+        return (
+            str(self.dates[index]),
+            float(self.columns['open'][index]),
+            float(self.columns['high'][index]),
+            float(self.columns['low'][index]),
+            float(self.close[index]),
+            int(self.columns['volume'][index]),
+        )
+
+
+class DailyHistoryStore:
+    """
+    One binary file per symbol in a directory, opened memory mapped so every process shares the page cache copy.
+    """
+
+    @staticmethod
+    def create() -> Optional['DailyHistoryStore']:
+        directory = os.getenv('HISTORY_STORE_DIR')
+
+        return DailyHistoryStore(directory) if directory else None
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # keyed by path with the (inode, mtime) of the file that was mapped so replaced files get re-opened
+        self._open: dict[str, tuple[tuple[int, int], DailyHistory]] = {}
+
+    def path(self, symbol: str) -> str:
+        if not _valid_symbol.match(symbol):
+            raise ValueError(f'Invalid symbol: {symbol}')
+
+        return os.path.join(self.directory, f'{symbol.upper()}.daily')
+
+    def open(self, symbol: str) -> Optional[DailyHistory]:
+        """The stored history, or None if there isn't one. The same object is returned until the file is replaced."""
+        path = self.path(symbol)
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        key = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._open.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        history = DailyHistory(buffer)
+        self._open[path] = (key, history)
+
+        return history
+
+    def write(self, symbol: str, daily: list['TimeSeriesDaily']):
+        """Atomically replaces the stored history so concurrent readers see either the old or new file, never a partial one."""
+        path = self.path(symbol)
+        ordered = sorted(daily, key=lambda item: item.date_value)
+
+        values = {
+            'date': [ item.date for item in ordered ],
+            'open': [ item.open for item in ordered ],
+            'high': [ item.high for item in ordered ],
+            'low': [ item.low for item in ordered ],
+            'close': [ item.close for item in ordered ],
+            'volume': [ item.volume for item in ordered ],
+        }
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(_header.pack(_magic, _version, len(ordered)))
+                for name, dtype in _columns:
+                    file.write(np.asarray(values[name], dtype=dtype).tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
@@ -0,0 +1,283 @@
+"""
+Offline load generator: drives concurrent sessions through the agent graph using a local Alpha Vantage stand-in and a scripted LLM.
+
+    python -m claude_stonks_agent.loadtest --sessions 20 --turns 3
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langgraph.graph import END
+from claude_stonks_agent.alpha_vantage import AlphaVantageClient, AlphaVantageService
+from claude_stonks_agent.graph import create_graph
+from claude_stonks_agent.market_calendar import MarketCalendar
+from claude_stonks_agent.router import fast_path_stats
+
+
+def _symbol_random(symbol: str) -> random.Random:
+    return random.Random(zlib.crc32(symbol.encode()))
+
+
+def _fake_search(keywords: str) -> dict:
+    symbol = keywords.upper()
+    return {
+        'bestMatches': [{
+            '1. symbol': symbol,
+            '2. name': f'{symbol} Inc',
+            '3. type': 'Equity',
+            '4. region': 'United States',
+            '8. currency': 'USD',
+        }]
+    }
+
+
+# the synthetic histories end here, sessions run against a calendar pinned to that evening so they never look stale
+_fake_latest_date = datetime(2024, 3, 1)
+
+
+def _fake_daily(symbol: str, days: int) -> dict:
+    rng = _symbol_random(symbol)
+    close = rng.uniform(10, 500)
+    date = _fake_latest_date
+    series = {}
+
+    # newest first, like the real API
+    for _ in range(days):
+        open_price = close * rng.uniform(0.98, 1.02)
+        series[date.strftime('%Y-%m-%d')] = {
+            '1. open': f'{open_price:.4f}',
+            '2. high': f'{max(open_price, close) * 1.01:.4f}',
+            '3. low': f'{min(open_price, close) * 0.99:.4f}',
+            '4. close': f'{close:.4f}',
+            '5. volume': str(rng.randint(100_000, 10_000_000)),
+        }
+        close = open_price
+        date -= timedelta(days=3 if date.weekday() == 0 else 1)
+
+    return { 'Time Series (Daily)': series }
+
+
+def _fake_quote(symbol: str) -> dict:
+    latest_date, latest = next(iter(_fake_daily(symbol, 1)['Time Series (Daily)'].items()))
+    return {
+        'Global Quote': {
+            '01. symbol': symbol,
+            '05. price': latest['4. close'],
+            '07. latest trading day': latest_date,
+        }
+    }
+
+
+def _fake_overview(symbol: str) -> dict:
+    return {
+        'Symbol': symbol,
+        'Name': f'{symbol} Inc',
+        'Description': f'{symbol} is a company used for load testing.',
+        'MarketCapitalization': str(_symbol_random(symbol).randint(1_000_000_000, 3_000_000_000_000)),
+    }
+
+
+class FakeAlphaVantageServer:
+    """
+    Local stand-in for the Alpha Vantage /query endpoint serving deterministic synthetic data
+    """
+    def __init__(self, latency_seconds: float = 0, days: int = 1000):
+        latency = latency_seconds
+        history_days = days
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = { key: values[0] for key, values in parse_qs(url.query).items() }
+                time.sleep(latency)
+
+                match params.get('function'):
+                    case 'SYMBOL_SEARCH':
+                        body = _fake_search(params.get('keywords', ''))
+                    case 'TIME_SERIES_DAILY':
+                        body = _fake_daily(params['symbol'], history_days)
+                    case 'GLOBAL_QUOTE':
+                        body = _fake_quote(params['symbol'])
+                    case 'OVERVIEW':
+                        body = _fake_overview(params['symbol'])
+                    case _:
+                        self.send_error(400, f'Unsupported function: {params.get("function")}')
+                        return
+
+                encoded = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/query'
+
+    def __enter__(self) -> 'FakeAlphaVantageServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_default_script = [
+    (
+        'I will look up the latest price.\n'
+        '<function_calls>\n<invoke>\n<tool_name>latest_price</tool_name>\n'
+        '<parameters>\n<symbol>{symbol}</symbol>\n</parameters>\n</invoke>\n</function_calls>'
+    ),
+    'The latest price of {symbol} is shown above.',
+]
+
+_ticker = re.compile(r'\b[A-Z]{2,5}\b')
+
+
+class ScriptedLLM(LLM):
+    """
+    Plays back completions by how many tool results have come back since the latest human message, so concurrent sessions stay independent.
+    Completions may use {symbol} for the first ticker-like word in the latest human message.
+    """
+    script: list[str] = _default_script
+    latency_seconds: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted'
+
+    def _call(
+            self,
+            prompt: str,
+            stop: List[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None,
+            **kwargs: Any
+        ) -> str:
+        time.sleep(self.latency_seconds)
+
+        turn = prompt[prompt.rfind('Human: '):]
+        human_line = turn.split('\n', 1)[0]
+        ticker = _ticker.search(human_line)
+
+        index = min(turn.count('<function_results>'), len(self.script) - 1)
+        return self.script[index].format(symbol=ticker.group(0) if ticker else 'AAPL')
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest rank percentile."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.samples[name].append(seconds)
+
+    def report(self, elapsed_seconds: float) -> str:
+        width = max([ len('name'), *map(len, self.samples) ]) + 2
+        lines = [ f'{"name":<{width}}{"count":>8}{"per sec":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}' ]
+        for name, values in sorted(self.samples.items()):
+            lines.append(
+                f'{name:<{width}}{len(values):>8}{len(values) / elapsed_seconds:>10.1f}'
+                f'{percentile(values, 0.5) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}'
+            )
+        return '\n'.join(lines)
+
+
+def run_session(graph, recorder: LatencyRecorder, symbols: list[str], turns: int, config: Optional[dict] = None):
+    steps = []
+
+    for turn in range(turns):
+        request = {
+            'input': f'What is the latest price of {symbols[turn % len(symbols)]}?',
+            'steps': steps
+        }
+
+        turn_start = node_start = time.perf_counter()
+        last_response = None
+        for state in graph.stream(request, config=config):
+            now = time.perf_counter()
+            for node in state.keys():
+                if node != END:
+                    recorder.record(f'node:{node}', now - node_start)
+            node_start = now
+            last_response = state
+
+        recorder.record('turn', time.perf_counter() - turn_start)
+
+        if last_response and END in last_response:
+            steps = last_response[END]['steps']
+
+
+def run_load(
+        sessions: int,
+        turns: int,
+        llm_latency_seconds: float = 0,
+        alpha_vantage_latency_seconds: float = 0,
+        symbols: Optional[list[str]] = None
+    ) -> str:
+    symbols = symbols or [ 'AAPL', 'MSFT', 'GOOG', 'AMZN', 'TSLA', 'GME' ]
+    recorder = LatencyRecorder()
+
+    with FakeAlphaVantageServer(latency_seconds=alpha_vantage_latency_seconds) as server:
+        calendar = MarketCalendar(fixed_now=_fake_latest_date.replace(hour=18, tzinfo=MarketCalendar.timezone))
+        alpha_vantage = AlphaVantageService(AlphaVantageClient('loadtest', base_url=server.url), calendar=calendar)
+        graph = create_graph(alpha_vantage=alpha_vantage, llm=ScriptedLLM(latency_seconds=llm_latency_seconds))
+        config = { 'recursion_limit': 100 }
+
+        stats_before = fast_path_stats.snapshot()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            futures = [
+                executor.submit(run_session, graph, recorder, symbols[index % len(symbols):] + symbols[:index % len(symbols)], turns, config)
+                for index in range(sessions)
+            ]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - start
+        router_stats = fast_path_stats.since(stats_before)
+
+    return f'{sessions} sessions x {turns} turns in {elapsed:.2f}s, {router_stats}\n' + recorder.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test of the agent graph')
+    parser.add_argument('--sessions', type=int, default=10, help='concurrent sessions')
+    parser.add_argument('--turns', type=int, default=3, help='turns per session')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds per scripted completion')
+    parser.add_argument('--alpha-vantage-latency', type=float, default=0.1, help='seconds per stand-in Alpha Vantage request')
+    args = parser.parse_args()
+
+    print(run_load(args.sessions, args.turns, args.llm_latency, args.alpha_vantage_latency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+
+def _easter(year: int) -> date:
+    # anonymous gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=32)
+def nyse_holidays(year: int) -> frozenset[date]:
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # martin luther king jr. day
+        _nth_weekday(year, 2, 0, 3),  # washington's birthday
+        _easter(year) - timedelta(days=2),  # good friday
+        _last_weekday(year, 5, 0),  # memorial day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # labor day
+        _nth_weekday(year, 11, 3, 4),  # thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+
+    # new year's day on a saturday isn't observed on the friday before
+    new_years = date(year, 1, 1)
+    if new_years.weekday() != 5:
+        holidays.add(_observed(new_years))
+
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))
+
+    return frozenset(holidays)
+
+
+class MarketCalendar:
+    """
+    US equity regular sessions, used to work out when the next daily bar should be available.
+    Early closes are treated as full days which only means a bar is expected a little later than it arrives.
+    """
+    timezone = ZoneInfo('America/New_York')
+    close = time(16, 0)
+
+    def __init__(self, publish_delay: timedelta = timedelta(minutes=30), fixed_now: Optional[datetime] = None):
+        # how long after the close the data provider has the day's bar
+        self.publish_delay = publish_delay
+        # pins the current time, e.g. to replay a recording as of when it was made
+        self.fixed_now = fixed_now
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+    def _now(self, now: Optional[datetime]) -> datetime:
+        return (now or self.fixed_now or datetime.now(self.timezone)).astimezone(self.timezone)
+
+    def bar_available_at(self, day: date) -> datetime:
+        return datetime.combine(day, self.close, self.timezone) + self.publish_delay
+
+    def latest_bar_date(self, now: Optional[datetime] = None) -> date:
+        """The most recent trading day whose bar should have been published."""
+        now = self._now(now)
+        day = now.date()
+
+        if not (self.is_trading_day(day) and now >= self.bar_available_at(day)):
+            day -= timedelta(days=1)
+
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+
+        return day
+
+    def next_bar_at(self, now: Optional[datetime] = None) -> datetime:
+        """When the next daily bar after the latest one should be published."""
+        day = self.latest_bar_date(now) + timedelta(days=1)
+
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+
+        return self.bar_available_at(day)
+
+    def is_stale(self, latest_date: date, now: Optional[datetime] = None) -> bool:
+        return latest_date < self.latest_bar_date(now)
+
+    def bars_behind(self, latest_date: date, now: Optional[datetime] = None) -> int:
+        """How many trading days' bars should have been published after latest_date."""
+        latest_bar_date = self.latest_bar_date(now)
+        day = latest_date + timedelta(days=1)
+        count = 0
+
+        while day <= latest_bar_date:
+            count += self.is_trading_day(day)
+            day += timedelta(days=1)
+
+        return count
@@ -0,0 +1,66 @@
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+from claude_stonks_agent.alpha_vantage import AlphaVantageService, parse_symbols
+
+
+class RefreshScheduler:
+    """
+    Background thread that re-fetches a watchlist's daily histories once each new bar is published, so interactive turns are served from cache
+    """
+
+    @staticmethod
+    def create(alpha_vantage: AlphaVantageService) -> Optional['RefreshScheduler']:
+        watchlist = parse_symbols(os.getenv('REFRESH_WATCHLIST', ''))
+
+        return RefreshScheduler(alpha_vantage, watchlist) if watchlist else None
+
+    def __init__(self, alpha_vantage: AlphaVantageService, watchlist: list[str]):
+        self.alpha_vantage = alpha_vantage
+        self.watchlist = watchlist
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def refresh_stale(self) -> int:
+        """Refreshes every stale symbol in the watchlist, returning how many are still stale afterwards."""
+        still_stale = 0
+
+        for symbol in self.watchlist:
+            if self._stop.is_set():
+                break
+
+            try:
+                if self.alpha_vantage.is_daily_stale(symbol):
+                    # skipped while a request triggered refresh of the same symbol is running, it's checked again next time round
+                    self.alpha_vantage.try_refresh_daily(symbol)
+                    still_stale += self.alpha_vantage.is_daily_stale(symbol)
+            except Exception as ex:
+                print(f'ERROR: Failed to refresh {symbol}')
+                print(ex)
+                still_stale += 1
+
+        return still_stale
+
+    def _seconds_until_next_bar(self) -> float:
+        calendar = self.alpha_vantage.calendar
+        return (calendar.next_bar_at() - datetime.now(calendar.timezone)).total_seconds()
+
+    def _run(self):
+        while not self._stop.is_set():
+            still_stale = self.refresh_stale()
+
+            # the provider can publish a bar later than expected so retry those before waiting for the next one
+            if still_stale:
+                wait = self.alpha_vantage.min_refresh_interval_seconds
+            else:
+                wait = max(self._seconds_until_next_bar(), 60)
+
+            self._stop.wait(wait)
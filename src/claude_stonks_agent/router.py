@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+from claude_stonks_agent.alpha_vantage import AlphaVantageService
+
+
+@dataclass
+class QuoteIntent:
+    kind: str  # 'price', 'market_cap' or 'price_on_date'
+    subject: str
+    date: Optional[str] = None
+
+
+_question_prefix = r"^\s*(?:(?:what(?:'s| is| was)|tell me|show me|get)\s+)?(?:the\s+)?(?:current\s+|latest\s+)?"
+_subject = r"(?P<subject>[A-Za-z][A-Za-z0-9.&\- ]{0,40}?)"
+_question_suffix = r"\s*(?:today|now)?\s*\??\s*$"
+
+_intent_patterns = [
+    ('price_on_date', re.compile(_question_prefix + r"(?:share |stock )?price (?:of|for) " + _subject + r" on (?P<date>\d{4}-\d{2}-\d{2})" + _question_suffix, re.IGNORECASE)),
+    ('price', re.compile(_question_prefix + r"(?:share |stock )?price (?:of|for) " + _subject + _question_suffix, re.IGNORECASE)),
+    ('market_cap', re.compile(_question_prefix + r"market cap(?:italization)? (?:of|for) " + _subject + _question_suffix, re.IGNORECASE)),
+    ('price', re.compile(r"^\s*" + _subject + r"(?:'s)? (?:share |stock )?price" + _question_suffix, re.IGNORECASE)),
+    ('market_cap', re.compile(r"^\s*" + _subject + r"(?:'s)? market cap(?:italization)?" + _question_suffix, re.IGNORECASE)),
+]
+
+
+# more than one subject isn't a simple question
+_multiple_subjects = re.compile(r"\b(?:and|or|vs|versus)\b", re.IGNORECASE)
+
+
+def match_quote_intent(text: str) -> Optional[QuoteIntent]:
+    for kind, pattern in _intent_patterns:
+        match = pattern.match(text)
+        if match:
+            groups = match.groupdict()
+            subject = groups['subject'].strip()
+
+            if _multiple_subjects.search(subject):
+                return None
+
+            return QuoteIntent(kind=kind, subject=subject, date=groups.get('date'))
+
+    return None
+
+
+_ticker = re.compile(r"^[A-Z][A-Z.\-]{0,5}$")
+
+# dropped when comparing a company name to what the user typed, e.g. "GameStop Corporation" -> "gamestop"
+_company_suffixes = { 'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'plc', 'holdings', 'group', 'class', 'a', 'b', 'c' }
+
+
+def _looks_like_ticker(subject: str) -> bool:
+    return bool(_ticker.match(subject))
+
+
+def _normalize_name(name: str) -> str:
+    words = re.sub(r"[^a-z0-9 ]", " ", name.lower()).split()
+
+    while len(words) > 1 and words[-1] in _company_suffixes:
+        words.pop()
+
+    return ' '.join(words)
+
+
+@dataclass
+class RouterStats:
+    total: int = 0
+    answered: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, answered: bool):
+        with self._lock:
+            self.total += 1
+            self.answered += answered
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of inputs answered without calling the LLM."""
+        return self.answered / self.total if self.total else 0
+
+    def snapshot(self) -> 'RouterStats':
+        with self._lock:
+            return RouterStats(total=self.total, answered=self.answered)
+
+    def since(self, earlier: 'RouterStats') -> 'RouterStats':
+        """Just the inputs routed after an earlier snapshot."""
+        current = self.snapshot()
+        return RouterStats(total=current.total - earlier.total, answered=current.answered - earlier.answered)
+
+    def __str__(self) -> str:
+        return f'fast path answered {self.answered} of {self.total} inputs ({self.hit_rate:.1%})'
+
+
+# shared by every router so the traffic taken off the LLM can be read from outside the graph
+fast_path_stats = RouterStats()
+
+
+class FastPathRouter:
+    """
+    Answers simple quote questions directly from Alpha Vantage, leaving everything else to the full agent
+    """
+
+    @staticmethod
+    def create(alpha_vantage: AlphaVantageService) -> Optional['FastPathRouter']:
+        enabled = os.getenv('FAST_PATH_ROUTER', '').lower() in ('1', 'true', 'yes')
+
+        return FastPathRouter(alpha_vantage) if enabled else None
+
+    def __init__(self, alpha_vantage: AlphaVantageService):
+        self.alpha_vantage = alpha_vantage
+        self.stats = fast_path_stats
+
+    def resolve_symbol(self, subject: str) -> Optional[str]:
+        """
+        The symbol for a ticker or company name, only if the search leaves no doubt which one was meant.
+        A ticker has to be typed in capitals, otherwise it's treated as a name (so "gold" isn't taken to mean GOLD).
+        """
+        results = self.alpha_vantage.search(subject)
+
+        if _looks_like_ticker(subject):
+            exact = [ result for result in results if result.symbol == subject ]
+            if len(exact) == 1:
+                return exact[0].symbol
+
+        named = [ result for result in results if _normalize_name(result.name) == _normalize_name(subject) ]
+
+        return named[0].symbol if len(named) == 1 else None
+
+    def _answer(self, text: str) -> Optional[str]:
+        intent = match_quote_intent(text)
+        if not intent:
+            return None
+
+        symbol = self.resolve_symbol(intent.subject)
+        if not symbol:
+            return None
+
+        match intent.kind:
+            case 'price':
+                price = self.alpha_vantage.latest_price(symbol)
+                return f'The latest price of {symbol} is ${price:,.2f}.'
+            case 'market_cap':
+                market_cap = self.alpha_vantage.latest_market_cap(symbol)
+                return f'The latest market capitalization of {symbol} is ${market_cap:,.0f}.'
+            case 'price_on_date':
+                daily = self.alpha_vantage.daily_on_date(symbol, intent.date)
+                if daily.date != intent.date:
+                    return f'There is no close for {symbol} on {intent.date}. Its closing price on {daily.date}, the last trading day before then, was ${daily.close:,.2f}.'
+                return f'The closing price of {symbol} on {daily.date} was ${daily.close:,.2f}.'
+
+        return None
+
+    def answer(self, text: str) -> Optional[str]:
+        """A templated answer, or None if the question should go to the full agent."""
+        try:
+            answer = self._answer(text)
+        except Exception:
+            # anything unexpected is left for the agent to work through
+            answer = None
+
+        self.stats.record(answered=answer is not None)
+
+        return answer
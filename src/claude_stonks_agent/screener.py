@@ -0,0 +1,194 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Optional
+from claude_stonks_agent.alpha_vantage import AlphaVantageService, _parse_date, parse_symbols
+
+
+class Screener:
+    """
+    Keeps daily closes for a universe of symbols as a single date x symbol matrix so screens run across every symbol at once
+    """
+
+    @staticmethod
+    def create(alpha_vantage: AlphaVantageService) -> 'Screener':
+        universe = parse_symbols(os.getenv('SCREENER_UNIVERSE', ''))
+
+        return Screener(alpha_vantage, universe)
+
+    def __init__(self, alpha_vantage: AlphaVantageService, symbols: list[str]):
+        self.alpha_vantage = alpha_vantage
+        self.symbols = symbols
+        self._closes: Optional[pd.DataFrame] = None
+        self._market_caps: Optional[pd.Series] = None
+        # the latest bar the calendar expected and the symbols that were behind it when the matrices were built
+        self._built_for: Optional[date] = None
+        self._stale_when_built: set[str] = set()
+        # symbols that couldn't be fetched are left empty and retried once the refresh interval has passed
+        self._failed: set[str] = set()
+        self._failed_at: float = 0
+
+    # a symbol this many bars behind is most likely waiting on a refresh rather than halted or delisted
+    max_missing_bars: int = 5
+
+    def refresh(self):
+        """Drops the aligned matrices so they are rebuilt from the service on next use."""
+        self._closes = None
+        self._market_caps = None
+        self._failed = set()
+
+    def _is_outdated(self) -> bool:
+        if self._built_for != self.alpha_vantage.calendar.latest_bar_date():
+            return True
+
+        if self._failed and time.monotonic() - self._failed_at >= self.alpha_vantage.min_refresh_interval_seconds:
+            return True
+
+        # a symbol that was behind has since been refreshed
+        return any(not self.alpha_vantage.is_daily_stale(symbol) for symbol in self._stale_when_built)
+
+    def _failed_symbol(self, symbol: str, ex: Exception):
+        print(f'ERROR: Failed to screen {symbol}')
+        print(ex)
+        self._failed.add(symbol)
+        self._failed_at = time.monotonic()
+
+    def _close_series(self, symbol: str) -> pd.Series:
+        if self.alpha_vantage.history_store:
+            # straight from the memory mapped columns rather than building and parsing a row object per day
+            history = self.alpha_vantage.daily_history(symbol)
+            return pd.Series(history.close, index=pd.DatetimeIndex(history.dates), dtype=np.float64)
+
+        daily = self.alpha_vantage.fetch_daily(symbol)
+        return pd.Series(
+            [ item.close for item in daily ],
+            index=pd.DatetimeIndex([ item.date_value for item in daily ]),
+            dtype=np.float64
+        )
+
+    def _close_series_or_empty(self, symbol: str) -> pd.Series:
+        try:
+            return self._close_series(symbol)
+        except Exception as ex:
+            self._failed_symbol(symbol, ex)
+            return pd.Series(dtype=np.float64, index=pd.DatetimeIndex([]))
+
+    def _market_cap_or_nan(self, symbol: str) -> float:
+        try:
+            return self.alpha_vantage.latest_market_cap(symbol)
+        except Exception as ex:
+            # e.g. a rate limit message, or an ETF whose overview has no market cap
+            self._failed_symbol(symbol, ex)
+            return np.nan
+
+    def closes(self) -> pd.DataFrame:
+        """
+        Close prices indexed by date (ascending) with a column per symbol, empty for any symbol that couldn't be fetched.
+        Gaps are forward filled, but not past the last close of a symbol more than max_missing_bars behind the calendar,
+        so halted or delisted symbols don't look like they're still trading while ones waiting on a refresh stay in every screen.
+        """
+        if self._closes is not None and self._is_outdated():
+            self.refresh()
+
+        if self._closes is None:
+            calendar = self.alpha_vantage.calendar
+            self._built_for = calendar.latest_bar_date()
+
+            columns = { symbol: self._close_series_or_empty(symbol) for symbol in self.symbols }
+
+            closes = pd.DataFrame(columns, columns=self.symbols).sort_index()
+            filled_to = closes.notna().iloc[::-1].cummax().iloc[::-1]
+
+            for symbol in self.symbols:
+                last_close_date = closes[symbol].last_valid_index()
+                if last_close_date is not None and calendar.bars_behind(last_close_date.date()) <= self.max_missing_bars:
+                    filled_to[symbol] = True
+
+            self._closes = closes.ffill().where(filled_to)
+            self._stale_when_built = { symbol for symbol in self.symbols if self.alpha_vantage.is_daily_stale(symbol) }
+
+        return self._closes
+
+    def market_caps(self) -> pd.Series:
+        """Market cap of each symbol, NaN for any that couldn't be fetched."""
+        if self._market_caps is not None and self._is_outdated():
+            self.refresh()
+
+        if self._market_caps is None:
+            self._market_caps = pd.Series(
+                [ self._market_cap_or_nan(symbol) for symbol in self.symbols ],
+                index=self.symbols,
+                dtype=np.float64
+            )
+
+        return self._market_caps
+
+    def filter_by_market_cap(self, min_market_cap: float = 0, max_market_cap: float = 0) -> list[str]:
+        """Symbols whose market cap is within the range. A bound of 0 means unbounded."""
+        if not min_market_cap and not max_market_cap:
+            return list(self.symbols)
+
+        market_caps = self.market_caps()
+        mask = np.ones(len(market_caps), dtype=bool)
+
+        if min_market_cap:
+            mask &= market_caps.to_numpy() >= min_market_cap
+        if max_market_cap:
+            mask &= market_caps.to_numpy() <= max_market_cap
+
+        return list(market_caps.index[mask])
+
+    def _row_on_or_before(self, closes: pd.DataFrame, date: str) -> pd.Series:
+        position = closes.index.searchsorted(_parse_date(date), side='right') - 1
+
+        if position < 0:
+            raise ValueError(f'No data found on or before {date}')
+
+        return closes.iloc[position]
+
+    def returns(self, start_date: str, end_date: str = '', symbols: Optional[list[str]] = None) -> pd.Series:
+        """Fractional return of each symbol between the closes on or before each date, NaN where there is no data."""
+        closes = self.closes()
+        if symbols is not None:
+            closes = closes[symbols]
+
+        start = self._row_on_or_before(closes, start_date)
+        end = self._row_on_or_before(closes, end_date) if end_date else closes.iloc[-1]
+
+        return end / start - 1
+
+    def top_by_return(self, start_date: str, end_date: str = '', n: int = 10, ascending: bool = False, symbols: Optional[list[str]] = None) -> pd.Series:
+        returns = self.returns(start_date, end_date, symbols).dropna()
+        ordered = returns.sort_values(ascending=ascending)
+
+        return ordered.iloc[:n]
+
+    def correlation(self, start_date: str = '', end_date: str = '', symbols: Optional[list[str]] = None) -> pd.DataFrame:
+        """Correlation matrix of daily returns."""
+        closes = self.closes()
+        if symbols is not None:
+            closes = closes[symbols]
+        if start_date:
+            closes = closes.loc[_parse_date(start_date):]
+        if end_date:
+            closes = closes.loc[:_parse_date(end_date)]
+
+        return closes.pct_change(fill_method=None).corr()
+
+    def top_correlated_pairs(self, start_date: str = '', end_date: str = '', n: int = 10, symbols: Optional[list[str]] = None) -> list[tuple[str, str, float]]:
+        """The n most correlated distinct pairs, rather than the full matrix which grows with the square of the universe."""
+        matrix = self.correlation(start_date, end_date, symbols)
+        values = matrix.to_numpy()
+
+        # upper triangle without the diagonal so each pair appears once
+        rows, cols = np.triu_indices(len(values), k=1)
+        pair_values = values[rows, cols]
+        valid = ~np.isnan(pair_values)
+        rows, cols, pair_values = rows[valid], cols[valid], pair_values[valid]
+
+        order = np.argsort(-pair_values)[:n]
+        labels = matrix.columns
+
+        return [ (labels[rows[i]], labels[cols[i]], float(pair_values[i])) for i in order ]
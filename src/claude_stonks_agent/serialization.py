@@ -0,0 +1,107 @@
+"""
+Versioned binary serialization of agent steps, for persisting sessions or passing them between processes.
+
+    python -m claude_stonks_agent.serialization
+"""
+import time
+import tracemalloc
+import msgpack
+from langchain_core.agents import AgentAction
+from claude_stonks_agent.claude import AgentActions
+from claude_stonks_agent.steps import AgentStep, HumanInputStep, ToolCallStep, ToolCallResultStep, AgentOutcomeStep
+
+
+# bump when the compact form of any step changes, older data is then rejected rather than misread
+_format_version = 2
+
+_step_types: dict[int, type[AgentStep]] = {
+    step_type.compact_tag: step_type
+    for step_type in (HumanInputStep, ToolCallStep, ToolCallResultStep, AgentOutcomeStep)
+}
+
+
+def serialize_steps(steps: list[AgentStep]) -> bytes:
+    return msgpack.packb(
+        [_format_version, [ [step.compact_tag, *step.to_compact()] for step in steps ]],
+        use_bin_type=True
+    )
+
+
+def deserialize_steps(data: bytes) -> list[AgentStep]:
+    version, steps = msgpack.unpackb(data, raw=False, use_list=True)
+
+    if version != _format_version:
+        raise ValueError(f'Unsupported steps format version: {version}')
+
+    result = []
+    for tag, *fields in steps:
+        step_type = _step_types.get(tag)
+        if step_type is None:
+            raise ValueError(f'Unknown step tag: {tag}')
+        result.append(step_type.from_compact(fields))
+
+    return result
+
+
+def check_round_trip(steps: list[AgentStep]):
+    """Raises an AssertionError unless every step comes back from serializing with the same type and fields."""
+    round_tripped = deserialize_steps(serialize_steps(steps))
+    expected = [ (type(step), step.to_compact()) for step in steps ]
+    actual = [ (type(step), step.to_compact()) for step in round_tripped ]
+
+    if actual != expected:
+        raise AssertionError(f'Steps did not round trip: {actual} != {expected}')
+
+
+def _example_session(turns: int) -> list[AgentStep]:
+    steps = []
+
+    for turn in range(turns):
+        action = AgentAction(tool='price_at_date', tool_input={ 'symbol': 'GME', 'date': f'2021-01-{turn % 28 + 1:02}' }, log='')
+        steps += [
+            HumanInputStep(f'What was the price of Gamestop at the start of January {turn}?'),
+            ToolCallStep(AgentActions(
+                actions=[action],
+                log='<function_calls>\n<invoke>\n<tool_name>price_at_date</tool_name>\n<parameters>\n<symbol>GME</symbol>\n</parameters>\n</invoke>\n</function_calls>'
+            )),
+            ToolCallResultStep([ (action, 17.25 + turn) ]),
+            AgentOutcomeStep(f'Gamestop (GME) was trading at ${17.25 + turn} at the start of January.'),
+        ]
+
+    return steps
+
+
+def benchmark(turns: int = 500, repeat: int = 20) -> str:
+    """In memory and serialized bytes per step, and microseconds per step to serialize and deserialize a long session."""
+    tracemalloc.start()
+    try:
+        steps = _example_session(turns)
+        in_memory_bytes, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    data = serialize_steps(steps)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        serialize_steps(steps)
+    serialize_seconds = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        deserialize_steps(data)
+    deserialize_seconds = (time.perf_counter() - start) / repeat
+
+    check_round_trip(steps)
+
+    return '\n'.join([
+        f'{len(steps)} steps, {in_memory_bytes} bytes in memory, {len(data)} bytes serialized',
+        f'in memory bytes per step: {in_memory_bytes / len(steps):.1f}',
+        f'serialized bytes per step: {len(data) / len(steps):.1f}',
+        f'serialize us per step: {serialize_seconds / len(steps) * 1e6:.2f}',
+        f'deserialize us per step: {deserialize_seconds / len(steps) * 1e6:.2f}',
+    ])
+
+
+if __name__ == '__main__':
+    print(benchmark())
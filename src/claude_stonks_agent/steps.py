@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
 from langchain_core.agents import AgentAction
 from claude_stonks_agent.claude import AgentActions, format_tool_responses
-from typing import Optional
+from typing import Any, Optional
 
 def merge_messages(messages1: list[BaseMessage], messages2: list[BaseMessage]) -> list[BaseMessage]:
     result = list(messages1)
@@ -20,6 +20,8 @@ class AgentStep(ABC):
     """
     Separate each step of the agent's work into a distinct item that will make it easier to display the conversation
     """
+    __slots__ = ()
+
     @staticmethod
     def steps_to_messages(steps: list['AgentStep']) -> list[BaseMessage]:
         result = []
@@ -32,10 +34,23 @@ class AgentStep(ABC):
     st_role: str = 'agent'
     st_avatar: Optional[str] = None
 
+    # identifies the step type in serialized form, must never be reused
+    compact_tag: int
+
     @abstractmethod
     def to_messages(self) -> list[BaseMessage]:
         pass
 
+    @abstractmethod
+    def to_compact(self) -> list[Any]:
+        """Fields as a list of plain values for serialization."""
+        pass
+
+    @classmethod
+    @abstractmethod
+    def from_compact(cls, fields: list[Any]) -> 'AgentStep':
+        pass
+
     def format_st_message(self) -> Optional[str]:
         return None
 
@@ -53,15 +68,26 @@ class AgentStep(ABC):
 
 
 class HumanInputStep(AgentStep):
+    __slots__ = ('input',)
+
     def __init__(self, input: str):
         self.input = input
 
+    compact_tag: int = 0
     st_role: str = 'human'
     st_avatar: Optional[str] = '👩🏻‍🦰'
 
     def to_messages(self) -> list[BaseMessage]:
         return [HumanMessage(content=self.input)]
 
+    def to_compact(self) -> list[Any]:
+        return [self.input]
+
+    @classmethod
+    def from_compact(cls, fields: list[Any]) -> 'HumanInputStep':
+        (input,) = fields
+        return cls(input)
+
     def format_st_message(self) -> Optional[str]:
         return self.input
 
@@ -69,9 +95,7 @@ class HumanInputStep(AgentStep):
         return 'HumanInputStep("{}")'.format(self.input)
 
 
-def format_tool_args(action: AgentAction) -> str:
-    tool_input = action.tool_input
-
+def format_tool_args(tool_input: Any) -> str:
     match tool_input:
         case str():
             return tool_input
@@ -84,62 +108,96 @@ def format_tool_args(action: AgentAction) -> str:
 
 class ToolCallStep(AgentStep):
     """
-    Request from the assistant to call a tool
+    Request from the assistant to call a tool.
+    Keeps (tool, tool_input) pairs rather than the AgentAction objects they were parsed into.
     """
+    __slots__ = ('log', 'calls')
+
     def __init__(self, agent_actions: AgentActions):
-        self.agent_actions = agent_actions
+        self.log: str = agent_actions.log
+        self.calls: tuple[tuple[str, Any], ...] = tuple((action.tool, action.tool_input) for action in agent_actions.actions)
 
+    compact_tag: int = 1
     display_in_history: bool = False
     st_role: str = 'assistant'
     st_avatar: Optional[str] = '🛠️'
 
+    @property
+    def agent_actions(self) -> AgentActions:
+        """Built on demand for the tool executor."""
+        actions = [ AgentAction(tool=tool, tool_input=tool_input, log='') for tool, tool_input in self.calls ]
+        return AgentActions(actions=actions, log=self.log)
+
     def to_messages(self) -> list[BaseMessage]:
-        return [AIMessage(content=self.agent_actions.log)]
+        return [AIMessage(content=self.log)]
+
+    def to_compact(self) -> list[Any]:
+        return [self.log, [ [tool, tool_input] for tool, tool_input in self.calls ]]
+
+    @classmethod
+    def from_compact(cls, fields: list[Any]) -> 'ToolCallStep':
+        log, calls = fields
+        step = cls.__new__(cls)
+        step.log = log
+        step.calls = tuple((tool, tool_input) for tool, tool_input in calls)
+        return step
 
     def __repr__(self) -> str:
         tool_calls_text = ';'.join([
-            f'{action.tool}({format_tool_args(action)})'
-            for action in self.agent_actions.actions
+            f'{tool}({format_tool_args(tool_input)})'
+            for tool, tool_input in self.calls
         ])
         return 'ToolCallStep("{}")'.format(tool_calls_text)
 
     def format_st_status_title(self) -> str | None:
-        first_action = self.agent_actions.actions[0]
-        return first_action.tool
+        tool, _ = self.calls[0]
+        return tool
 
     def format_st_status_content(self) -> str | None:
-        first_action = self.agent_actions.actions[0]
-        return f'{first_action.tool}({format_tool_args(first_action)})'
+        tool, tool_input = self.calls[0]
+        return f'{tool}({format_tool_args(tool_input)})'
 
 
 class ToolCallResultStep(AgentStep):
     """
-    Results of a call to a tool
+    Results of a call to a tool, kept as (tool, tool_input, output) rather than the AgentAction that was run
     """
-    def __init__(self, results: list[tuple[AgentAction, str]]):
-        self.results = results
+    __slots__ = ('results',)
 
+    def __init__(self, results: list[tuple[AgentAction, Any]]):
+        self.results: tuple[tuple[str, Any, Any], ...] = tuple((action.tool, action.tool_input, output) for action, output in results)
+
+    compact_tag: int = 2
     display_in_history: bool = False
     st_role: str = 'assistant'
     st_avatar: Optional[str] = '️👾'
 
     def to_messages(self) -> list[BaseMessage]:
-        formatted = format_tool_responses(self.results)
+        formatted = format_tool_responses([ (tool, output) for tool, _, output in self.results ])
         return [AIMessage(content=formatted)]
 
+    def to_compact(self) -> list[Any]:
+        return [[ [tool, tool_input, output] for tool, tool_input, output in self.results ]]
+
+    @classmethod
+    def from_compact(cls, fields: list[Any]) -> 'ToolCallResultStep':
+        (results,) = fields
+        step = cls.__new__(cls)
+        step.results = tuple((tool, tool_input, output) for tool, tool_input, output in results)
+        return step
 
     def format_st_status_title(self) -> str | None:
-        (first_action, result) = self.results[0]
-        return f'received {first_action.tool}({format_tool_args(first_action)})'
+        tool, tool_input, _ = self.results[0]
+        return f'received {tool}({format_tool_args(tool_input)})'
 
     def format_st_status_content(self) -> str | None:
-        (first_action, result) = self.results[0]
-        return f'{first_action.tool}({format_tool_args(first_action)})\n{result}'
+        tool, tool_input, output = self.results[0]
+        return f'{tool}({format_tool_args(tool_input)})\n{output}'
 
     def __repr__(self) -> str:
         tool_outputs = ';'.join([
-            f'{action.tool}({format_tool_args(action)}) -> {output}'
-            for action, output in self.results
+            f'{tool}({format_tool_args(tool_input)}) -> {output}'
+            for tool, tool_input, output in self.results
         ])
         return 'ToolCallResultStep("{}")'.format(tool_outputs)
 
@@ -148,17 +206,48 @@ class AgentOutcomeStep(AgentStep):
     """
     Final response from the agent
     """
+    __slots__ = ('output',)
+
     def __init__(self, output: str):
         self.output = output
 
+    compact_tag: int = 3
     st_role: str = 'assistant'
     st_avatar: Optional[str] = '🤖'
 
     def to_messages(self) -> list[BaseMessage]:
         return [ AIMessage(content=self.output) ]
 
+    def to_compact(self) -> list[Any]:
+        return [self.output]
+
+    @classmethod
+    def from_compact(cls, fields: list[Any]) -> 'AgentOutcomeStep':
+        (output,) = fields
+        return cls(output)
+
     def format_st_message(self) -> Optional[str]:
         return self.output
 
     def __repr__(self) -> str:
-        return f'AgentOutcomeStep({self.output.strip()})'
\ No newline at end of file
+        return f'AgentOutcomeStep({self.output.strip()})'
+
+
+def trim_tool_steps(steps: list[AgentStep], keep_turns: int = 1) -> list[AgentStep]:
+    """
+    Drops the tool call and result steps from all but the last keep_turns turns (all of them when keep_turns is 0).
+    This caps the prompt as well as the size of a session: older turns are left with just the human input and the
+    outcome, which already states whatever the tool results were used for.
+    """
+    turn_starts = [ index for index, step in enumerate(steps) if isinstance(step, HumanInputStep) ]
+
+    if keep_turns <= 0:
+        keep_from = len(steps)
+    else:
+        keep_from = turn_starts[-keep_turns] if len(turn_starts) >= keep_turns else 0
+
+    return [
+        step
+        for index, step in enumerate(steps)
+        if index >= keep_from or not isinstance(step, (ToolCallStep, ToolCallResultStep))
+    ]
@@ -1,5 +1,6 @@
 from claude_stonks_agent.alpha_vantage import AlphaVantageService, SearchResult
 from claude_stonks_agent.claude import XmlBuilder
+from claude_stonks_agent.screener import Screener
 from langchain_core.tools import StructuredTool, tool
 from typing import Optional
 from datetime import datetime
@@ -56,4 +57,62 @@ def create_alpha_vantage_tools(alpha_vantage: AlphaVantageService) -> list[Struc
         StructuredTool.from_function(price_at_date),
         StructuredTool.from_function(latest_market_capitalization),
         StructuredTool.from_function(current_date)
-    ]
\ No newline at end of file
+    ]
+
+
+# upper bound on the rows any screen returns so a large universe can't flood the prompt
+_max_screen_results = 25
+
+
+def create_screener_tools(screener: Screener) -> list[StructuredTool]:
+    if not screener.symbols:
+        return []
+
+    def screen_stocks(
+            screen: str,
+            start_date: str = '',
+            end_date: str = '',
+            min_market_cap: float = 0,
+            max_market_cap: float = 0,
+            limit: int = 10
+        ) -> str:
+        """
+        Screens across a fixed universe of stock symbols at once.
+        screen is one of: top_gainers, top_losers (ranked by return from start_date to end_date), correlated_pairs (most correlated pairs of daily returns between start_date and end_date) or market_cap (symbols within the market cap range).
+        Dates are formatted as YYYY-MM-DD e.g. 2021-01-01, end_date defaults to the latest date.
+        min_market_cap and max_market_cap are in US dollars and restrict the symbols screened, 0 means no limit.
+        """
+        limit = max(1, min(int(limit), _max_screen_results))
+        symbols = screener.filter_by_market_cap(float(min_market_cap), float(max_market_cap))
+
+        builder = XmlBuilder()
+        with builder.tag_with_children('results'):
+            match screen:
+                case 'top_gainers' | 'top_losers':
+                    if not start_date:
+                        raise ValueError(f'start_date is required for {screen}')
+
+                    ranked = screener.top_by_return(start_date, end_date, n=limit, ascending=screen == 'top_losers', symbols=symbols)
+                    for symbol, value in ranked.items():
+                        with builder.tag_with_children('result'):
+                            builder.tag_with_text('symbol', symbol)
+                            builder.tag_with_text('return_percent', f'{value * 100:.2f}')
+                case 'correlated_pairs':
+                    for first, second, value in screener.top_correlated_pairs(start_date, end_date, n=limit, symbols=symbols):
+                        with builder.tag_with_children('result'):
+                            builder.tag_with_text('symbols', f'{first},{second}')
+                            builder.tag_with_text('correlation', f'{value:.3f}')
+                case 'market_cap':
+                    market_caps = screener.market_caps()[symbols].dropna().sort_values(ascending=False)
+                    for symbol, value in market_caps.iloc[:limit].items():
+                        with builder.tag_with_children('result'):
+                            builder.tag_with_text('symbol', symbol)
+                            builder.tag_with_text('market_cap', f'{value:.0f}')
+                case _:
+                    raise ValueError(f'Unknown screen: {screen}')
+
+        return str(builder)
+
+    return [
+        StructuredTool.from_function(screen_stocks)
+    ]
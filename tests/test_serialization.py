@@ -0,0 +1,74 @@
+import msgpack
+import pytest
+from langchain_core.agents import AgentAction
+from claude_stonks_agent.claude import AgentActions, XmlBuilder
+from claude_stonks_agent.serialization import _step_types, check_round_trip, deserialize_steps, serialize_steps
+from claude_stonks_agent.steps import AgentStep, HumanInputStep, ToolCallStep, ToolCallResultStep, AgentOutcomeStep
+
+
+def _search_results_xml() -> str:
+    builder = XmlBuilder()
+    with builder.tag_with_children('results'):
+        for symbol, name in [ ('GME', 'GameStop Corp'), ('GMEV', 'Games & Esports Experience') ]:
+            with builder.tag_with_children('result'):
+                builder.tag_with_text('symbol', symbol)
+                builder.tag_with_text('name', name)
+    return str(builder)
+
+
+def _screen_results_xml() -> str:
+    builder = XmlBuilder()
+    with builder.tag_with_children('results'):
+        with builder.tag_with_children('result'):
+            builder.tag_with_text('symbols', 'AAPL,MSFT')
+            builder.tag_with_text('correlation', '0.871')
+    return str(builder)
+
+
+def _turn(tool: str, tool_input, output) -> list[AgentStep]:
+    action = AgentAction(tool=tool, tool_input=tool_input, log='')
+    return [
+        HumanInputStep(f'Please use {tool}'),
+        ToolCallStep(AgentActions(actions=[action], log=f'<function_calls>\n<invoke>\n<tool_name>{tool}</tool_name>\n</invoke>\n</function_calls>')),
+        ToolCallResultStep([ (action, output) ]),
+        AgentOutcomeStep(f'Used {tool} 📈'),
+    ]
+
+
+_sessions = {
+    'float output': _turn('latest_price', { 'symbol': 'GME' }, 17.25),
+    'string tool input': _turn('current_date', '', '2024-03-01'),
+    'nested list parameters': _turn(
+        'screen_stocks',
+        { 'screen': 'correlated_pairs', 'symbols': [ 'AAPL', 'MSFT', { 'symbol': 'GOOG' } ], 'limit': '5' },
+        _screen_results_xml()
+    ),
+    'search results xml': _turn('search_for_symbol', { 'term': 'gamestop' }, _search_results_xml()),
+    'no output': _turn('search_for_symbol', { 'term': 'nothing' }, None),
+    'int output': _turn('latest_market_capitalization', { 'symbol': 'GME' }, 7_000_000_000),
+}
+
+
+@pytest.mark.parametrize('steps', _sessions.values(), ids=_sessions.keys())
+def test_steps_round_trip(steps: list[AgentStep]):
+    check_round_trip(steps)
+
+
+@pytest.mark.parametrize('steps', _sessions.values(), ids=_sessions.keys())
+def test_round_tripped_steps_give_the_same_messages(steps: list[AgentStep]):
+    round_tripped = deserialize_steps(serialize_steps(steps))
+
+    assert AgentStep.steps_to_messages(round_tripped) == AgentStep.steps_to_messages(steps)
+    assert [ repr(step) for step in round_tripped ] == [ repr(step) for step in steps ]
+
+
+def test_every_step_type_is_covered():
+    # a new step type has to be added to the sessions above to be checked
+    covered = { type(step) for steps in _sessions.values() for step in steps }
+
+    assert covered == set(_step_types.values())
+
+
+def test_rejects_other_format_versions():
+    with pytest.raises(ValueError):
+        deserialize_steps(msgpack.packb([1, []]))
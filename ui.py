@@ -1,11 +1,14 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+from dataclasses import dataclass
 from typing import Optional
 import streamlit as st
 import random
 from claude_stonks_agent.graph import create_graph
-from claude_stonks_agent.steps import AgentStep, HumanInputStep, ToolCallStep, ToolCallResultStep, AgentOutcomeStep
+from claude_stonks_agent.alpha_vantage import AlphaVantageService
+from claude_stonks_agent.refresh import RefreshScheduler
+from claude_stonks_agent.steps import AgentStep, HumanInputStep, ToolCallStep, ToolCallResultStep, AgentOutcomeStep, trim_tool_steps
 from langgraph.graph import END
 
 st.set_page_config(
@@ -45,23 +48,71 @@ def text_to_markdown(text: str) -> str:
         .replace('\n', '\n\n') \
         .replace('$', '\\$')
 
-graph = create_graph()
+@st.cache_resource
+def get_graph():
+    # shared across reruns and sessions so caches and background refreshes outlive a single script run
+    alpha_vantage = AlphaVantageService.create()
+
+    refresh_scheduler = RefreshScheduler.create(alpha_vantage)
+    if refresh_scheduler:
+        refresh_scheduler.start()
+
+    return create_graph(alpha_vantage=alpha_vantage)
+
+graph = get_graph()
 graph_config = { 'recursion_limit': 100, 'max_concurrency': 20 }
 
+# number of messages shown initially and added each time earlier history is requested
+messages_page_size = 20
+
+# turns whose tool calls and results stay in the model's context, older turns keep only the question and the answer
+context_tool_turns = 3
+
+
+@dataclass
+class ChatMessage:
+    role: str
+    avatar: Optional[str]
+    markdown: str
+
+
+def steps_to_chat_messages(steps: list[AgentStep]) -> list[ChatMessage]:
+    messages = []
+
+    for step in steps:
+        message_text = step.format_st_message()
+
+        if message_text:
+            messages.append(ChatMessage(step.st_role, step.st_avatar, text_to_markdown(message_text)))
+
+    return messages
+
+
 if 'chat_steps' not in st.session_state:
     st.session_state.chat_steps = []
 
-def read_chat_steps() -> list[ToolCallStep]:
+# rendered once when a turn finishes rather than on every rerun
+if 'chat_messages' not in st.session_state:
+    st.session_state.chat_messages = []
+
+if 'visible_messages' not in st.session_state:
+    st.session_state.visible_messages = messages_page_size
+
+def read_chat_steps() -> list[AgentStep]:
     return st.session_state.chat_steps
 
-for step in read_chat_steps():
-    message_text = step.format_st_message()
+def show_earlier_messages():
+    st.session_state.visible_messages += messages_page_size
+
+chat_messages: list[ChatMessage] = st.session_state.chat_messages
+hidden_messages = len(chat_messages) - st.session_state.visible_messages
 
-    if not message_text:
-        continue
+if hidden_messages > 0:
+    st.button(f'Show {min(hidden_messages, messages_page_size)} earlier messages', on_click=show_earlier_messages)
 
-    with st.chat_message(step.st_role, avatar=step.st_avatar):
-        st.markdown(text_to_markdown(message_text))
+for message in chat_messages[-st.session_state.visible_messages:]:
+    with st.chat_message(message.role, avatar=message.avatar):
+        st.markdown(message.markdown)
 
 
 if prompt := st.chat_input('> '):
@@ -104,5 +155,8 @@ if prompt := st.chat_input('> '):
             else:
                 st.write(f'Finished with unexpected step: {last_step}')
 
-            st.session_state.chat_steps = steps
+            new_steps = steps[len(request['steps']):]
+            # the display is rendered from these, so the steps are only the model's context for the next turn
+            st.session_state.chat_messages = chat_messages + steps_to_chat_messages(new_steps)
+            st.session_state.chat_steps = trim_tool_steps(steps, keep_turns=context_tool_turns)
 